@@ -1,35 +1,237 @@
-from fastapi import FastAPI, HTTPException
-from mangum import Mangum
-import boto3
+from contextlib import AsyncExitStack, asynccontextmanager
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, RootModel
+from cachetools import TTLCache
+import asyncio
+import base64
+import logging
+import orjson
 import os
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-# Initialize DynamoDB resource (region from environment or AWS config)
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ.get("TABLE_NAME", "ItemsTable"))
+TABLE_NAME = os.environ.get("TABLE_NAME", "ItemsTable")
+
+# Read-through cache for GET /items/{item_id}; local writes evict, so staleness is bounded by the TTL.
+# Items can be up to 400 KB, so the cache is bounded by their serialized bytes (READ_CACHE_BYTES)
+# rather than entry count, and items larger than _CACHE_MAX_BYTES are never cached.
+# A GET awaits DynamoDB between its cache miss and its store, so a write can evict in between;
+# _evictions counts every eviction and the GET only stores if it did not change meanwhile.
+_cache: TTLCache = TTLCache(
+    maxsize=int(os.environ.get("READ_CACHE_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get("READ_CACHE_TTL", "30")),
+    getsizeof=lambda entry: entry[1],
+)
+_CACHE_MAX_BYTES = min(64 * 1024, _cache.maxsize)
+_evictions = 0
+
+def _evict(*item_ids: str):
+    global _evictions
+    _evictions += 1
+    for item_id in item_ids:
+        _cache.pop(item_id, None)
+
+# The DynamoDB table and client are opened on first use rather than at import, keeping
+# botocore's loader and credential resolution off the cold-start path, and then reused
+# for the life of the process (across warm Lambda invocations)
+_clients = AsyncExitStack()
+_table = None
+_client = None
+_connect_lock = asyncio.Lock()
+
+async def _connect():
+    global _table, _client
+    async with _connect_lock:
+        if _table is not None:
+            return
+        import aioboto3
+        from aiobotocore.config import AioConfig
+        # Pooled keep-alive connections sized for bursty concurrency; fail fast and let adaptive retries absorb throttling
+        cfg = AioConfig(
+            max_pool_connections=int(os.environ.get("AWS_POOL", "50")),
+            connect_timeout=1,
+            read_timeout=3,
+            retries={"mode": "adaptive", "max_attempts": 3},
+        )
+        # Region from environment or AWS config
+        session = aioboto3.Session()
+        dynamodb = await _clients.enter_async_context(session.resource("dynamodb", config=cfg))
+        # Low-level client for hot writes: takes wire-format items, skipping the resource's
+        # per-call parameter transformation
+        _client = await _clients.enter_async_context(session.client("dynamodb", config=cfg))
+        _table = await dynamodb.Table(TABLE_NAME)
+
+@lru_cache(maxsize=1)
+def _serializer():
+    # One TypeSerializer for the process instead of one per resource call
+    from boto3.dynamodb.types import TypeSerializer
+    return TypeSerializer()
+
+async def get_table():
+    if _table is None:
+        await _connect()
+    return _table
+
+async def get_client():
+    if _table is None:
+        await _connect()
+    return _client
+
+async def _warm():
+    # Best effort: resolve credentials and the endpoint and open pooled connections for both the
+    # table resource and the low-level write client; on failure they connect on first request
+    try:
+        table = await get_table()
+        await table.load()
+        client = await get_client()
+        await client.describe_table(TableName=TABLE_NAME)
+    except Exception:
+        logger.warning("DynamoDB warm-up failed; connecting on first request", exc_info=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _warm()
+    yield
+    # Release pooled connections when served by an ASGI server that runs shutdown
+    global _table, _client
+    await _clients.aclose()
+    _table = _client = None
+
+# orjson only serializes integers in the signed/unsigned 64-bit range
+_JSON_INT_MIN, _JSON_INT_MAX = -(2**63), 2**64 - 1
+
+def _json_default(obj: Any) -> Any:
+    # DynamoDB returns every number as Decimal, sets as Python sets and binary values as Binary
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            value = int(obj)
+            # Wider integers (DynamoDB allows 38 digits) are sent as exact decimal strings
+            return value if _JSON_INT_MIN <= value <= _JSON_INT_MAX else str(value)
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    from boto3.dynamodb.types import Binary
+    if isinstance(obj, Binary):
+        return base64.b64encode(obj.value).decode()
+    raise TypeError
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, with DynamoDB Decimals, sets and binary values handled.
+
+    Handlers return instances directly so FastAPI skips its jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_json_default)
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+class Item(BaseModel):
+    """An item to store; attributes beyond `id` and `value` are kept as-is."""
+
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    value: Any
+
+class Update(RootModel[dict[str, Any]]):
+    """Attributes to set on an existing item."""
+
+@lru_cache(maxsize=128)
+def _update_expression(keys: tuple[str, ...]) -> tuple[str, dict[str, str]]:
+    # SET expression and name placeholders depend only on the attribute names, so reuse them per key-set
+    expr = "SET " + ", ".join(f"#a{i}=:v{i}" for i in range(len(keys)))
+    names = {f"#a{i}": k for i, k in enumerate(keys)}
+    return expr, names
+
+@lru_cache(maxsize=128)
+def _projection(fields: str) -> tuple[list[str], str, dict[str, str]]:
+    # Parse ?fields=a,b once per distinct value into attribute names and a ProjectionExpression
+    attrs = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    names = {f"#f{i}": f for i, f in enumerate(attrs)}
+    return attrs, ",".join(names), names
 
 @app.post("/items")
-def create_item(item: dict):
-    # Validate input (could use Pydantic model for schema)
-    if "id" not in item or "value" not in item:
-        raise HTTPException(status_code=400, detail="Invalid item data")
-    # Put item into DynamoDB
-    table.put_item(Item=item)
-    return {"message": f"Item {item['id']} created."}
+async def create_item(item: Item, client=Depends(get_client)):
+    # Put item into DynamoDB (request body already validated by the Item model),
+    # serializing with the shared TypeSerializer and writing through the low-level client
+    serialize = _serializer().serialize
+    payload = {k: serialize(v) for k, v in item.model_dump().items()}
+    await client.put_item(TableName=TABLE_NAME, Item=payload)
+    _evict(item.id)
+    return ORJSONResponse({"message": f"Item {item.id} created."})
+
+@app.post("/items:batch")
+async def create_items(items: list[Item], table=Depends(get_table)):
+    # batch_writer groups puts into 25-item BatchWriteItem calls and resends unprocessed items
+    async with table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+        for item in items:
+            await batch.put_item(Item=item.model_dump())
+    _evict(*(item.id for item in items))
+    return ORJSONResponse({"message": f"{len(items)} items created."})
 
 @app.put("/items/{item_id}")
-def update_item(item_id: str, update: dict):
+async def update_item(item_id: str, body: Update, table=Depends(get_table)):
     # Update item in DynamoDB (expects `update` contains attributes to update)
-    attrs = {k: {"Value": v, "Action": "PUT"} for k, v in update.items()}
-    table.update_item(Key={"id": item_id}, AttributeUpdates=attrs)
-    return {"message": f"Item {item_id} updated."}
+    update = body.root
+    if not update:
+        raise HTTPException(status_code=400, detail="No attributes to update")
+    keys = tuple(sorted(update))
+    expr, names = _update_expression(keys)
+    values = {f":v{i}": update[k] for i, k in enumerate(keys)}
+    await table.update_item(
+        Key={"id": item_id},
+        UpdateExpression=expr,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+    )
+    _evict(item_id)
+    return ORJSONResponse({"message": f"Item {item_id} updated."})
 
 @app.get("/items/{item_id}")
-def get_item(item_id: str):
-    response = table.get_item(Key={"id": item_id})
-    if "Item" not in response:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return response["Item"]
+async def get_item(item_id: str, fields: str | None = None, table=Depends(get_table)):
+    attrs, projection, names = _projection(fields) if fields else (None, None, None)
+    cached = _cache.get(item_id)
+    if cached is not None:
+        item = cached[0]
+    else:
+        evictions = _evictions
+        kwargs: dict[str, Any] = {"Key": {"id": item_id}}
+        if projection:
+            # Only fetch the requested attributes; partial items are not cached
+            kwargs["ProjectionExpression"] = projection
+            kwargs["ExpressionAttributeNames"] = names
+        response = await table.get_item(**kwargs)
+        if "Item" not in response:
+            raise HTTPException(status_code=404, detail="Item not found")
+        if projection:
+            return ORJSONResponse(response["Item"])
+        item = response["Item"]
+        if _evictions == evictions:
+            size = len(orjson.dumps(item, default=_json_default))
+            if size <= _CACHE_MAX_BYTES:
+                _cache[item_id] = (item, size)
+    if attrs:
+        return ORJSONResponse({k: item[k] for k in attrs if k in item})
+    return ORJSONResponse(item)
+
+@app.delete("/items/{item_id}")
+async def delete_item(item_id: str, table=Depends(get_table)):
+    await table.delete_item(Key={"id": item_id})
+    _evict(item_id)
+    return ORJSONResponse({"message": f"Item {item_id} deleted."})
 
-handler = Mangum(app)  # AWS Lambda entry point
+# AWS Lambda entry point, only built inside Lambda so tests and local uvicorn runs skip
+# the Mangum import. Lifespan is off because Mangum would run it around every
+# invocation, closing the shared table's connections each time; instead the table is
+# warmed during the init phase (and captured in the snapshot under SnapStart) on the
+# event loop Mangum then reuses for every invocation.
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    from mangum import Mangum
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    asyncio.get_event_loop().run_until_complete(_warm())
+    handler = Mangum(app, lifespan="off")
@@ -1,23 +1,146 @@
-from fastapi import FastAPI, Response, HTTPException
-from mangum import Mangum
-import boto3, os
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import Depends, FastAPI, Header, Response, HTTPException
+from fastapi.responses import StreamingResponse
+from botocore.exceptions import ClientError
+from cachetools import TTLCache
+import asyncio, logging, os
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
-s3 = boto3.client("s3")  # region will be picked from environment or AWS config
 bucket_name = os.environ.get("BUCKET_NAME", "my-demo-bucket")
 bucket_owner = os.environ.get("BUCKET_OWNER")  # Expected bucket owner account ID
+# Parameters shared by every request against the bucket, built once at import
+_BASE_GET = {"Bucket": bucket_name}
+if bucket_owner:
+    _BASE_GET["ExpectedBucketOwner"] = bucket_owner
+# Small objects are kept in memory for READ_CACHE_TTL seconds; larger ones are always streamed.
+# The cache is bounded by total body bytes (READ_CACHE_BYTES), not entry count, so it fits the
+# function's memory size; least recently used objects are evicted past the budget.
+_cache: TTLCache = TTLCache(
+    maxsize=int(os.environ.get("READ_CACHE_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get("READ_CACHE_TTL", "30")),
+    getsizeof=lambda entry: len(entry[0]),
+)
+_CACHE_MAX_BYTES = min(256 * 1024, _cache.maxsize)
+
+# S3 client is created on first use (not at import) and kept for the life of the process
+_clients = AsyncExitStack()
+_s3 = None
+_s3_lock = asyncio.Lock()
+
+async def get_s3():
+    global _s3
+    if _s3 is None:
+        async with _s3_lock:
+            if _s3 is None:
+                import aioboto3
+                from aiobotocore.config import AioConfig
+                # Larger keep-alive pool for concurrent GETs, short timeouts with adaptive retries
+                cfg = AioConfig(
+                    max_pool_connections=int(os.environ.get("AWS_POOL", "50")),
+                    connect_timeout=1,
+                    read_timeout=3,
+                    retries={"mode": "adaptive", "max_attempts": 3},
+                )
+                # Region will be picked from environment or AWS config
+                _s3 = await _clients.enter_async_context(aioboto3.Session().client("s3", config=cfg))
+    return _s3
+
+async def _warm():
+    # HeadBucket resolves credentials and the bucket's endpoint and leaves a pooled connection open;
+    # a failure only means the first request connects instead
+    try:
+        s3 = await get_s3()
+        await s3.head_bucket(**_BASE_GET)
+    except Exception:
+        logger.warning("S3 warm-up failed; connecting on first request", exc_info=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _warm()
+    yield
+    # Close the client's connection pool on server shutdown
+    global _s3
+    await _clients.aclose()
+    _s3 = None
+
+app = FastAPI(lifespan=lifespan)
+
+async def _stream_body(body, chunk_size: int = 64 * 1024):
+    # Relay the S3 body as it arrives; the context manager releases the connection back to the pool
+    async with body:
+        async for chunk in body.iter_chunks(chunk_size):
+            yield chunk
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match may be "*" or a comma-separated list of (possibly weak) entity tags
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
 
 @app.get("/files/{file_key:path}")
-def get_file(file_key: str):
+async def get_file(
+    file_key: str,
+    range_header: str | None = Header(default=None, alias="Range"),
+    if_none_match: str | None = Header(default=None),
+    s3=Depends(get_s3),
+):
+    # Range requests go straight to S3; only whole objects are cached
+    if range_header is None:
+        cached = _cache.get(file_key)
+        if cached is not None:
+            content, headers = cached
+            if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+                return Response(status_code=304, headers={"ETag": headers["ETag"]})
+            return Response(content, headers=headers)
+    # Conditional/partial GETs are forwarded so S3 can answer with 304/206 and skip the body
+    conditions = {}
+    if range_header:
+        conditions["Range"] = range_header
+    if if_none_match:
+        conditions["IfNoneMatch"] = if_none_match
     try:
-        get_params = {"Bucket": bucket_name, "Key": file_key}
-        if bucket_owner:
-            get_params["ExpectedBucketOwner"] = bucket_owner
-        obj = s3.get_object(**get_params)
-    except s3.exceptions.NoSuchKey:
-        raise HTTPException(status_code=404, detail="File not found")
-    # Assuming text file for simplicity; if binary, we might return Base64 or set StreamingResponse
-    content = obj['Body'].read()
-    return Response(content, media_type="text/plain")
-
-handler = Mangum(app)
+        obj = await s3.get_object(Key=file_key, **_BASE_GET, **conditions)
+    except ClientError as e:
+        # Match on the error code rather than the modeled exception classes
+        code = e.response["Error"]["Code"]
+        if code == "304":
+            etag = e.response["ResponseMetadata"]["HTTPHeaders"].get("etag")
+            return Response(status_code=304, headers={"ETag": etag} if etag else None)
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found")
+        if code == "InvalidRange":
+            # RFC 9110 asks for the current length on a 416 so clients can retry with a valid range
+            size = e.response["Error"].get("ActualObjectSize")
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"} if size else None,
+            )
+        raise
+    # Echo S3's metadata verbatim (no charset suffix) so binary objects are not re-encoded,
+    # and pass validators through so CloudFront/browsers can revalidate
+    headers = {
+        "Content-Type": obj.get("ContentType") or "application/octet-stream",
+        "Content-Length": str(obj['ContentLength']),
+        "ETag": obj['ETag'],
+        "Last-Modified": obj['LastModified'].strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Accept-Ranges": "bytes",
+    }
+    if "ContentRange" in obj:
+        headers["Content-Range"] = obj['ContentRange']
+        return StreamingResponse(_stream_body(obj['Body']), status_code=206, headers=headers)
+    if obj['ContentLength'] <= _CACHE_MAX_BYTES:
+        async with obj['Body']:
+            content = await obj['Body'].read()
+        _cache[file_key] = (content, headers)
+        return Response(content, headers=headers)
+    return StreamingResponse(_stream_body(obj['Body']), headers=headers)
+
+# Lambda-only entry point; Mangum would otherwise run lifespan around each invocation
+# and close the shared client, so warm it at init on the loop Mangum reuses
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    from mangum import Mangum
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    asyncio.get_event_loop().run_until_complete(_warm())
+    handler = Mangum(app, lifespan="off")
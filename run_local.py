@@ -0,0 +1,26 @@
+"""Serve one of the Lambda apps locally with uvicorn on uvloop + httptools.
+
+Usage: python run_local.py [lambda-dynamo|lambda-s3]
+
+uvicorn is not shipped in the Lambda packages; install it alongside the app's deps:
+    pip install -r requirements-dev.txt -r lambda-dynamo/requirements.txt
+
+PORT and WEB_CONCURRENCY (worker processes) are read from the environment.
+For containerized non-Lambda deploys, run the same app under gunicorn:
+    gunicorn -k uvicorn.workers.UvicornWorker --chdir lambda-dynamo app:app
+"""
+import os
+import sys
+import uvicorn
+
+if __name__ == "__main__":
+    app_dir = sys.argv[1] if len(sys.argv) > 1 else "lambda-dynamo"
+    uvicorn.run(
+        "app:app",
+        app_dir=app_dir,
+        host="127.0.0.1",
+        port=int(os.environ.get("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+    )
@@ -0,0 +1,140 @@
+# type: ignore
+"""Shared fixtures: one moto server, table, bucket and app client per test session."""
+import os
+import sys
+import boto3
+import pytest
+import importlib.util
+from fastapi.testclient import TestClient
+from moto.server import ThreadedMotoServer
+
+# Set AWS region and mock credentials before any client or app is created
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['TABLE_NAME'] = 'ItemsTable'
+os.environ['BUCKET_NAME'] = 'test-bucket'
+
+
+def _load_app(name, directory):
+    """Load a Lambda app module by path; both functions ship an `app.py`."""
+    app_path = os.path.join(os.path.dirname(__file__), '..', directory, 'app.py')
+    spec = importlib.util.spec_from_file_location(name, app_path)
+    module = importlib.util.module_from_spec(spec)
+    # Pydantic resolves model annotations through sys.modules
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def mocked_aws():
+    """Run moto in server mode; in-process mocking does not cover aiobotocore."""
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    os.environ['AWS_ENDPOINT_URL'] = f"http://{host}:{port}"
+    yield
+    del os.environ['AWS_ENDPOINT_URL']
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def _items_table(mocked_aws):
+    dynamodb = boto3.resource('dynamodb')
+    return dynamodb.create_table(
+        TableName='ItemsTable',
+        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+@pytest.fixture
+def dyn_table(request, _items_table):
+    """The shared ItemsTable, emptied after each test instead of being re-created.
+
+    Parametrize it indirectly with a list of items to seed it in batched writes.
+    """
+    seed = getattr(request, 'param', ())
+    if seed:
+        with _items_table.batch_writer() as batch:
+            for item in seed:
+                batch.put_item(Item=item)
+    yield _items_table
+    scan_kwargs = {'ProjectionExpression': 'id'}
+    with _items_table.batch_writer() as batch:
+        while True:
+            page = _items_table.scan(**scan_kwargs)
+            for item in page['Items']:
+                batch.delete_item(Key={'id': item['id']})
+            if 'LastEvaluatedKey' not in page:
+                break
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+@pytest.fixture(scope="session")
+def _files_bucket(mocked_aws):
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='test-bucket')
+    return s3
+
+
+@pytest.fixture
+def s3_bucket(_files_bucket):
+    """S3 client for the shared test-bucket, emptied after each test."""
+    yield _files_bucket
+    for page in _files_bucket.get_paginator('list_objects_v2').paginate(Bucket='test-bucket'):
+        keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if keys:
+            _files_bucket.delete_objects(Bucket='test-bucket', Delete={'Objects': keys})
+
+
+@pytest.fixture(scope="session")
+def dynamo_module(mocked_aws):
+    return _load_app('dynamo_app', 'lambda-dynamo')
+
+
+@pytest.fixture(scope="session")
+def _dynamo_session_client(dynamo_module, _items_table):
+    # Entered once so the lifespan, event loop and AWS clients live for the whole session;
+    # startup warms against the table, so it must exist first
+    with TestClient(dynamo_module.app) as client:
+        yield client
+
+
+@pytest.fixture
+def dynamo_client(dynamo_module, _dynamo_session_client, dyn_table):
+    """TestClient for the DynamoDB app, with its read cache reset per test."""
+    yield _dynamo_session_client
+    dynamo_module._cache.clear()
+
+
+@pytest.fixture(scope="session")
+def s3_module(mocked_aws):
+    return _load_app('s3_app', 'lambda-s3')
+
+
+@pytest.fixture(scope="session")
+def _s3_session_client(s3_module, _files_bucket):
+    with TestClient(s3_module.app) as client:
+        yield client
+
+
+@pytest.fixture
+def load_fresh_app(monkeypatch, _items_table, _files_bucket):
+    """Load a fresh copy of a Lambda app module with extra environment variables set."""
+    def load(directory, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return _load_app(f"{directory.replace('-', '_')}_custom", directory)
+    return load
+
+
+@pytest.fixture
+def s3_client(s3_module, _s3_session_client, s3_bucket):
+    """TestClient for the S3 app, with its read cache reset per test."""
+    yield _s3_session_client
+    s3_module._cache.clear()
@@ -1,145 +1,213 @@
 # type: ignore
 """Tests for Lambda DynamoDB function using mocked AWS services."""
-import os
-import sys
-import boto3
-import importlib.util
-from typing import TYPE_CHECKING
+import pytest
+from decimal import Decimal
+from boto3.dynamodb.types import Binary
 from fastapi.testclient import TestClient
-from moto import mock_aws
 
-if TYPE_CHECKING:
-    from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+# Items the read/update tests draw from; each test seeds only the ones it reads
+SEED_ITEMS = [
+    {'id': 'test2', 'value': 'initial'},
+    {'id': 'test3', 'value': 'retrieve_me', 'count': 3, 'ratio': Decimal('0.5'), 'tags': {'a', 'b'},
+     'big': Decimal('123456789012345678901234567890'), 'blob': Binary(b'\x00\x01')},
+    {'id': 'test4', 'value': 'cached'},
+    {'id': 'test5', 'value': 'keep', 'other': 'drop', 'note': 'also'},
+]
 
-# Set AWS region and mock credentials before importing app
-os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
-os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
-os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
-os.environ['AWS_SECURITY_TOKEN'] = 'testing'
-os.environ['AWS_SESSION_TOKEN'] = 'testing'
-os.environ['TABLE_NAME'] = 'ItemsTable'
 
+def seeded(*item_ids):
+    """Seed dyn_table with the SEED_ITEMS having the given ids, in one batch."""
+    items = [item for item in SEED_ITEMS if item['id'] in item_ids]
+    return pytest.mark.parametrize('dyn_table', [items], indirect=True, ids=['seeded'])
 
-def _load_dynamo_app():
-    """Load the DynamoDB app module dynamically to avoid import conflicts."""
-    app_path = os.path.join(os.path.dirname(__file__), '..', 'lambda-dynamo', 'app.py')
-    spec = importlib.util.spec_from_file_location("dynamo_app", app_path)
-    module = importlib.util.module_from_spec(spec)  # type: ignore
-    spec.loader.exec_module(module)  # type: ignore
-    return module.app
 
+# A full BatchWriteItem call's worth of items
+BULK_ITEMS = [{'id': f'bulk{i}', 'value': f'v{i}'} for i in range(25)]
 
-@mock_aws
-def test_create_item():
+
+def test_create_item(dynamo_client, dyn_table):
     """Test creating an item in DynamoDB via the FastAPI endpoint."""
-    # Set up in-memory DynamoDB table
-    dynamodb = boto3.resource('dynamodb')  # type: ignore[misc]
-    dynamodb.create_table(  # type: ignore[attr-defined]
-        TableName='ItemsTable',
-        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
-        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    
-    # Import app after mock is set up
-    app = _load_dynamo_app()
-    
-    client = TestClient(app)
-    
     # Test POST /items endpoint
     item_data = {'id': 'test1', 'value': 'hello'}
-    resp = client.post('/items', json=item_data)
+    resp = dynamo_client.post('/items', json=item_data)
     assert resp.status_code == 200
     assert 'message' in resp.json()
-    
+
     # Verify the item was written to DynamoDB
-    table = dynamodb.Table('ItemsTable')  # type: ignore[attr-defined]
-    result = table.get_item(Key={'id': 'test1'})
+    result = dyn_table.get_item(Key={'id': 'test1'})
     assert 'Item' in result
     assert result['Item']['value'] == 'hello'
 
 
-@mock_aws
-def test_update_item():
+def test_create_items_batch(dynamo_client, dyn_table):
+    """Test bulk-creating items in DynamoDB via the batch endpoint."""
+    # More than one BatchWriteItem call's worth of items
+    items = [{'id': f'batch{i}', 'value': i} for i in range(30)]
+    resp = dynamo_client.post('/items:batch', json=items)
+    assert resp.status_code == 200
+    assert resp.json()['message'] == '30 items created.'
+
+    # Verify every item was written to DynamoDB
+    assert dyn_table.scan()['Count'] == 30
+
+    # An item missing a required key rejects the whole batch
+    resp = dynamo_client.post('/items:batch', json=[{'id': 'bad'}])
+    assert resp.status_code == 422
+    assert 'Item' not in dyn_table.get_item(Key={'id': 'bad'})
+
+
+@seeded('test2')
+def test_update_item(dynamo_client, dyn_table):
     """Test updating an item in DynamoDB via the FastAPI endpoint."""
-    # Set up in-memory DynamoDB table
-    dynamodb = boto3.resource('dynamodb')  # type: ignore[misc]
-    dynamodb.create_table(  # type: ignore[attr-defined]
-        TableName='ItemsTable',
-        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
-        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    
-    # Insert initial item
-    table = dynamodb.Table('ItemsTable')  # type: ignore[attr-defined]
-    table.put_item(Item={'id': 'test2', 'value': 'initial'})
-    
-    # Import app after mock is set up
-    app = _load_dynamo_app()
-    
-    client = TestClient(app)
-    
     # Test PUT /items/{item_id} endpoint
     update_data = {'value': 'updated'}
-    resp = client.put('/items/test2', json=update_data)
+    resp = dynamo_client.put('/items/test2', json=update_data)
     assert resp.status_code == 200
     assert 'message' in resp.json()
-    
+
     # Verify the item was updated
-    result = table.get_item(Key={'id': 'test2'})
+    result = dyn_table.get_item(Key={'id': 'test2'})
     assert 'Item' in result
     assert result['Item']['value'] == 'updated'
 
+    # Several attributes in one request, including a new one
+    resp = dynamo_client.put('/items/test2', json={'value': 'again', 'note': 'extra'})
+    assert resp.status_code == 200
+    result = dyn_table.get_item(Key={'id': 'test2'})
+    assert result['Item']['value'] == 'again'
+    assert result['Item']['note'] == 'extra'
+
+    # An empty update is rejected
+    resp = dynamo_client.put('/items/test2', json={})
+    assert resp.status_code == 400
 
-@mock_aws
-def test_get_item():
+
+@seeded('test3')
+def test_get_item(dynamo_client, dynamo_module, dyn_table, monkeypatch):
     """Test retrieving an item from DynamoDB via the FastAPI endpoint."""
-    # Set up in-memory DynamoDB table
-    dynamodb = boto3.resource('dynamodb')  # type: ignore[misc]
-    dynamodb.create_table(  # type: ignore[attr-defined]
-        TableName='ItemsTable',
-        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
-        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    
-    # Insert test item
-    table = dynamodb.Table('ItemsTable')  # type: ignore[attr-defined]
-    table.put_item(Item={'id': 'test3', 'value': 'retrieve_me'})
-    
-    # Import app after mock is set up
-    app = _load_dynamo_app()
-    
-    client = TestClient(app)
+    # Spy on the orjson hook to prove FastAPI's jsonable_encoder pass is skipped
+    hook_calls = []
+    json_default = dynamo_module._json_default
+    monkeypatch.setattr(dynamo_module, '_json_default', lambda obj: hook_calls.append(obj) or json_default(obj))
     
     # Test GET /items/{item_id} endpoint
-    resp = client.get('/items/test3')
+    resp = dynamo_client.get('/items/test3')
     assert resp.status_code == 200
     data = resp.json()
     assert data['id'] == 'test3'
     assert data['value'] == 'retrieve_me'
+    # DynamoDB numbers come back as plain JSON numbers
+    assert data['count'] == 3
+    assert data['ratio'] == 0.5
+    # String sets come back as JSON arrays
+    assert sorted(data['tags']) == ['a', 'b']
+    # Integers beyond 64 bits come back as exact strings, binary values as base64
+    assert data['big'] == '123456789012345678901234567890'
+    assert data['blob'] == 'AAE='
+    assert hook_calls
+
+
+@seeded('test5')
+def test_get_item_fields(dynamo_client, dyn_table):
+    """Test retrieving selected attributes with ?fields=."""
+    # Projected read straight from DynamoDB
+    resp = dynamo_client.get('/items/test5', params={'fields': 'value,note'})
+    assert resp.status_code == 200
+    assert resp.json() == {'value': 'keep', 'note': 'also'}
+
+    # Same projection applied to a cached full item
+    assert dynamo_client.get('/items/test5').json()['other'] == 'drop'
+    resp = dynamo_client.get('/items/test5', params={'fields': 'value'})
+    assert resp.json() == {'value': 'keep'}
+
+
+@pytest.mark.parametrize('dyn_table', [BULK_ITEMS], indirect=True, ids=['batch25'])
+def test_get_item_batch_seeded(dynamo_client, dyn_table):
+    """Test every item of a batch-seeded table is readable via the FastAPI endpoint."""
+    for item in BULK_ITEMS:
+        resp = dynamo_client.get(f"/items/{item['id']}")
+        assert resp.status_code == 200
+        assert resp.json() == item
 
 
-@mock_aws
-def test_get_item_not_found():
+def test_get_item_not_found(dynamo_client):
     """Test retrieving a non-existent item returns 404."""
-    # Set up in-memory DynamoDB table
-    dynamodb = boto3.resource('dynamodb')  # type: ignore[misc]
-    dynamodb.create_table(  # type: ignore[attr-defined]
-        TableName='ItemsTable',
-        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
-        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    
-    # Import app after mock is set up
-    app = _load_dynamo_app()
-    
-    client = TestClient(app)
-    
     # Test GET for non-existent item
-    resp = client.get('/items/nonexistent')
+    resp = dynamo_client.get('/items/nonexistent')
     assert resp.status_code == 404
     assert 'detail' in resp.json()
 
+
+@seeded('test4')
+def test_read_cache_invalidated_by_writes(dynamo_client, dyn_table):
+    """Test cached reads are evicted by update and delete."""
+    # Populate the cache
+    assert dynamo_client.get('/items/test4').json()['value'] == 'cached'
+
+    # Writes behind the app's back are not seen until the TTL expires
+    dyn_table.put_item(Item={'id': 'test4', 'value': 'external'})
+    assert dynamo_client.get('/items/test4').json()['value'] == 'cached'
+
+    # Writes through the app evict the cached entry
+    dynamo_client.put('/items/test4', json={'value': 'updated'})
+    assert dynamo_client.get('/items/test4').json()['value'] == 'updated'
+
+    # Test DELETE /items/{item_id} endpoint
+    resp = dynamo_client.delete('/items/test4')
+    assert resp.status_code == 200
+    assert 'Item' not in dyn_table.get_item(Key={'id': 'test4'})
+    assert dynamo_client.get('/items/test4').status_code == 404
+
+
+@seeded('test4')
+def test_read_cache_skips_store_after_concurrent_write(dynamo_client, dynamo_module, dyn_table):
+    """Test a GET does not cache an item a write evicted while the read was in flight."""
+    class RacingTable:
+        def __init__(self, table):
+            self._table = table
+
+        async def get_item(self, **kwargs):
+            response = await self._table.get_item(**kwargs)
+            # A PUT/DELETE completes while the GET is awaiting DynamoDB
+            dynamo_module._evict(kwargs['Key']['id'])
+            return response
+
+    async def racing_table():
+        return RacingTable(await dynamo_module.get_table())
+
+    dynamo_module.app.dependency_overrides[dynamo_module.get_table] = racing_table
+    try:
+        assert dynamo_client.get('/items/test4').json()['value'] == 'cached'
+    finally:
+        dynamo_module.app.dependency_overrides.clear()
+    assert 'test4' not in dynamo_module._cache
+
+    # Without a concurrent write the item is cached as usual
+    dynamo_client.get('/items/test4')
+    assert 'test4' in dynamo_module._cache
+
+
+def test_warm_up_failure_does_not_block_startup(load_fresh_app, caplog):
+    """Test a failed warm-up against a missing table is logged and the app still starts."""
+    module = load_fresh_app('lambda-dynamo', TABLE_NAME='MissingTable')
+
+    with TestClient(module.app):
+        assert module._table is not None
+    assert 'DynamoDB warm-up failed' in caplog.text
+
+
+@pytest.mark.parametrize('dyn_table', [[{'id': f'budget{i}', 'value': str(i) * 400} for i in range(5)]],
+                         indirect=True, ids=['budget'])
+def test_read_cache_byte_budget(load_fresh_app, dyn_table):
+    """Test the read cache evicts items to stay within READ_CACHE_BYTES."""
+    module = load_fresh_app('lambda-dynamo', READ_CACHE_BYTES='1000')
+
+    with TestClient(module.app) as client:
+        for i in range(5):
+            resp = client.get(f'/items/budget{i}')
+            assert resp.status_code == 200
+            assert resp.json()['value'] == str(i) * 400
+            assert module._cache.currsize <= 1000
+
+    # Only the two most recent items fit
+    assert sorted(module._cache) == ['budget3', 'budget4']
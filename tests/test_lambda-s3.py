@@ -1,212 +1,232 @@
 # type: ignore
 """Tests for Lambda S3 function using mocked AWS services."""
-import os
-import sys
-import boto3
-import importlib.util
 from fastapi.testclient import TestClient
-from moto import mock_aws
 
-# Set AWS region and mock credentials before importing app
-os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
-os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
-os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
-os.environ['AWS_SECURITY_TOKEN'] = 'testing'
-os.environ['AWS_SESSION_TOKEN'] = 'testing'
-os.environ['BUCKET_NAME'] = 'test-bucket'
 
-
-def _load_s3_app():
-    """Load the S3 app module dynamically to avoid import conflicts."""
-    app_path = os.path.join(os.path.dirname(__file__), '..', 'lambda-s3', 'app.py')
-    spec = importlib.util.spec_from_file_location("s3_app", app_path)
-    module = importlib.util.module_from_spec(spec)  # type: ignore
-    spec.loader.exec_module(module)  # type: ignore
-    return module.app
-
-
-@mock_aws
-def test_get_file_success():
+def test_get_file_success(s3_client, s3_bucket):
     """Test retrieving a file from S3 via the FastAPI endpoint."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
     # Upload a test file
     test_content = b'Hello, this is a test file!'
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='test-file.txt',
-        Body=test_content
+        Body=test_content,
+        ContentType='text/plain'
     )
     
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET /files/{file_key} endpoint
-    resp = client.get('/files/test-file.txt')
+    resp = s3_client.get('/files/test-file.txt')
     assert resp.status_code == 200
     assert resp.content == test_content
-    assert resp.headers['content-type'] == 'text/plain; charset=utf-8'
+    assert resp.headers['content-type'] == 'text/plain'
 
 
-@mock_aws
-def test_get_file_not_found():
+def test_get_file_not_found(s3_client):
     """Test retrieving a non-existent file returns 404."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET for non-existent file
-    resp = client.get('/files/nonexistent-file.txt')
+    resp = s3_client.get('/files/nonexistent-file.txt')
     assert resp.status_code == 404
     assert 'detail' in resp.json()
     assert resp.json()['detail'] == 'File not found'
 
 
-@mock_aws
-def test_get_file_with_path():
+def test_get_file_with_path(s3_client, s3_bucket):
     """Test retrieving a file with a path prefix."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
     # Upload a test file with path
     test_content = b'File in subdirectory'
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='folder/subfolder/document.txt',
         Body=test_content
     )
     
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET with path
-    resp = client.get('/files/folder/subfolder/document.txt')
+    resp = s3_client.get('/files/folder/subfolder/document.txt')
     assert resp.status_code == 200
     assert resp.content == test_content
 
 
-@mock_aws
-def test_get_file_binary_content():
+def test_get_file_binary_content(s3_client, s3_bucket):
     """Test retrieving binary file content."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
     # Upload a binary file (simulated image data)
     binary_content = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00'
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='image.png',
         Body=binary_content,
         ContentType='image/png'
     )
     
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET for binary file
-    resp = client.get('/files/image.png')
+    resp = s3_client.get('/files/image.png')
     assert resp.status_code == 200
     assert resp.content == binary_content
+    assert resp.headers['content-type'] == 'image/png'
+    assert resp.headers['etag']
+    assert resp.headers['last-modified'].endswith(' GMT')
 
 
-@mock_aws
-def test_get_file_with_bucket_owner():
+def test_get_file_with_bucket_owner(s3_client, s3_module, s3_bucket, monkeypatch):
     """Test retrieving a file with bucket owner verification."""
-    # Set environment variable for bucket owner
-    os.environ['BUCKET_OWNER'] = '123456789012'
-    
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
+    # BUCKET_OWNER is baked into the request parameters at import; patch them instead of reloading the app
+    monkeypatch.setitem(s3_module._BASE_GET, 'ExpectedBucketOwner', '123456789012')
     
     # Upload a test file
     test_content = b'Secure file content'
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='secure-file.txt',
         Body=test_content
     )
     
-    # Import app after mock is set up (need to reload to pick up BUCKET_OWNER)
-    import importlib
-    if 'app' in sys.modules:
-        importlib.reload(sys.modules['app'])
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET with bucket owner parameter
-    resp = client.get('/files/secure-file.txt')
+    resp = s3_client.get('/files/secure-file.txt')
     assert resp.status_code == 200
     assert resp.content == test_content
-    
-    # Clean up
-    del os.environ['BUCKET_OWNER']
 
 
-@mock_aws
-def test_get_empty_file():
+def test_bucket_owner_read_at_import(load_fresh_app):
+    """Test BUCKET_OWNER is folded into the GetObject parameters when the module loads."""
+    module = load_fresh_app('lambda-s3', BUCKET_OWNER='123456789012')
+    assert module._BASE_GET == {'Bucket': 'test-bucket', 'ExpectedBucketOwner': '123456789012'}
+
+
+def test_get_empty_file(s3_client, s3_bucket):
     """Test retrieving an empty file."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
     # Upload an empty file
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='empty.txt',
         Body=b''
     )
     
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET for empty file
-    resp = client.get('/files/empty.txt')
+    resp = s3_client.get('/files/empty.txt')
     assert resp.status_code == 200
     assert resp.content == b''
 
 
-@mock_aws
-def test_get_large_file():
+def test_get_large_file(s3_client, s3_bucket):
     """Test retrieving a larger file."""
-    # Set up in-memory S3 bucket
-    s3_client = boto3.client('s3')  # type: ignore[misc]
-    s3_client.create_bucket(Bucket='test-bucket')  # type: ignore[attr-defined]
-    
     # Upload a larger test file (1MB)
     large_content = b'A' * (1024 * 1024)  # 1MB of 'A's
-    s3_client.put_object(  # type: ignore[attr-defined]
+    s3_bucket.put_object(  # type: ignore[attr-defined]
         Bucket='test-bucket',
         Key='large-file.bin',
         Body=large_content
     )
     
-    # Import app after mock is set up
-    app = _load_s3_app()
-    
-    client = TestClient(app)
-    
     # Test GET for large file
-    resp = client.get('/files/large-file.bin')
+    resp = s3_client.get('/files/large-file.bin')
     assert resp.status_code == 200
     assert len(resp.content) == 1024 * 1024
     assert resp.content == large_content
 
+
+def test_get_file_range(s3_client, s3_bucket):
+    """Test a Range request returns only the requested bytes."""
+    # Upload a test file
+    s3_bucket.put_object(  # type: ignore[attr-defined]
+        Bucket='test-bucket',
+        Key='range.bin',
+        Body=b'0123456789'
+    )
+    
+    # Test GET with a byte range
+    resp = s3_client.get('/files/range.bin', headers={'Range': 'bytes=2-5'})
+    assert resp.status_code == 206
+    assert resp.content == b'2345'
+    assert resp.headers['content-range'] == 'bytes 2-5/10'
+    assert resp.headers['accept-ranges'] == 'bytes'
+
+    # A range past the end of the object is rejected
+    resp = s3_client.get('/files/range.bin', headers={'Range': 'bytes=100-200'})
+    assert resp.status_code == 416
+    assert resp.headers['content-range'] == 'bytes */10'
+
+    # A range response is not cached as the whole object
+    resp = s3_client.get('/files/range.bin')
+    assert resp.status_code == 200
+    assert resp.content == b'0123456789'
+
+
+def test_get_file_not_modified(s3_client, s3_module, s3_bucket):
+    """Test If-None-Match with the current ETag returns 304 without a body."""
+    # Upload a test file larger than the read cache limit so S3 answers the condition
+    large_content = b'B' * (s3_module._CACHE_MAX_BYTES + 1)
+    s3_bucket.put_object(  # type: ignore[attr-defined]
+        Bucket='test-bucket',
+        Key='conditional.bin',
+        Body=large_content
+    )
+    
+    etag = s3_client.get('/files/conditional.bin').headers['etag']
+    resp = s3_client.get('/files/conditional.bin', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.content == b''
+    assert resp.headers['etag'] == etag
+
+    # A stale ETag still gets the full object
+    resp = s3_client.get('/files/conditional.bin', headers={'If-None-Match': '"stale"'})
+    assert resp.status_code == 200
+    assert resp.content == large_content
+
+
+def test_get_file_cached(s3_client, s3_bucket):
+    """Test small files are served from the read cache on repeat requests."""
+    # Upload a test file
+    test_content = b'Cache me'
+    s3_bucket.put_object(  # type: ignore[attr-defined]
+        Bucket='test-bucket',
+        Key='cached.txt',
+        Body=test_content,
+        ContentType='text/plain'
+    )
+    
+    first = s3_client.get('/files/cached.txt')
+    assert first.status_code == 200
+
+    # Removing the object does not affect reads until the TTL expires
+    s3_bucket.delete_object(Bucket='test-bucket', Key='cached.txt')  # type: ignore[attr-defined]
+    second = s3_client.get('/files/cached.txt')
+    assert second.status_code == 200
+    assert second.content == test_content
+    assert second.headers['content-type'] == 'text/plain'
+    assert second.headers['etag'] == first.headers['etag']
+
+    # Conditional requests are answered from the cache too
+    third = s3_client.get('/files/cached.txt', headers={'If-None-Match': first.headers['etag']})
+    assert third.status_code == 304
+    assert third.content == b''
+
+
+def test_read_cache_byte_budget(load_fresh_app, s3_bucket):
+    """Test the read cache evicts objects to stay within READ_CACHE_BYTES."""
+    module = load_fresh_app('lambda-s3', READ_CACHE_BYTES='1000')
+    
+    # Upload more small files than the budget can hold
+    for i in range(5):
+        s3_bucket.put_object(  # type: ignore[attr-defined]
+            Bucket='test-bucket',
+            Key=f'budget-{i}.bin',
+            Body=bytes([i]) * 400
+        )
+    
+    with TestClient(module.app) as client:
+        for i in range(5):
+            resp = client.get(f'/files/budget-{i}.bin')
+            assert resp.status_code == 200
+            assert resp.content == bytes([i]) * 400
+            assert module._cache.currsize <= 1000
+
+    # Only the two most recent objects fit
+    assert sorted(module._cache) == ['budget-3.bin', 'budget-4.bin']
+
+
+def test_warm_up_failure_does_not_block_startup(load_fresh_app, caplog):
+    """Test a failed HeadBucket warm-up is logged and the app still starts."""
+    module = load_fresh_app('lambda-s3', BUCKET_NAME='missing-bucket')
+
+    with TestClient(module.app):
+        assert module._s3 is not None
+    assert 'S3 warm-up failed' in caplog.text